@@ -0,0 +1,112 @@
+# pdf_lines.py
+import os
+import pickle
+from pathlib import Path
+import fitz  # PyMuPDF
+import numpy as np
+
+CACHE_DIR = Path("/app/cache")
+_CACHE_VERSION = 1  # Bump when the layout returned by extract_lines changes
+
+def extract_lines(doc, flags):
+    """
+    Streams every text span of a document once, using the given
+    get_text("dict") flags, and returns its layout column-wise, shared by
+    the outline extractor (span level) and the 1b chunk parser (line level):
+
+    - "spans": stripped text list plus NumPy arrays for rounded font size,
+      flags, page number and bbox (x0, y0, x1, y1);
+    - "lines": joined text, bbox y0 and index of the first span of every
+      non-empty line;
+    - per-page "page_width"/"page_height", plus "page_count" and
+      "metadata_title".
+    """
+    texts, sizes, span_flags, page_nums = [], [], [], []
+    x0s, y0s, x1s, y1s = [], [], [], []
+    line_texts, line_y0s, line_first = [], [], []
+    page_widths, page_heights = [], []
+    for page_num, page in enumerate(doc):
+        page_widths.append(page.rect.width)
+        page_heights.append(page.rect.height)
+        for b in page.get_text("dict", flags=flags)["blocks"]:
+            for l in b.get("lines", []):
+                if not l["spans"]: continue
+                first = len(texts)
+                for s in l["spans"]:
+                    x0, y0, x1, y1 = s["bbox"]
+                    texts.append(s["text"].strip())
+                    sizes.append(round(s["size"], 2))
+                    span_flags.append(s["flags"])
+                    page_nums.append(page_num)
+                    x0s.append(x0); y0s.append(y0); x1s.append(x1); y1s.append(y1)
+
+                text = " ".join(s["text"] for s in l["spans"]).strip()
+                if not text: continue
+                line_texts.append(text)
+                line_y0s.append(l["bbox"][1])
+                line_first.append(first)
+
+    return {
+        "page_count": doc.page_count,
+        "metadata_title": doc.metadata.get("title") if doc.metadata else None,
+        "page_width": np.asarray(page_widths, dtype=float),
+        "page_height": np.asarray(page_heights, dtype=float),
+        "spans": {
+            "text": texts,
+            "size": np.asarray(sizes, dtype=float),
+            "flags": np.asarray(span_flags, dtype=np.int64),
+            "page_num": np.asarray(page_nums, dtype=np.int64),
+            "x0": np.asarray(x0s, dtype=float),
+            "y0": np.asarray(y0s, dtype=float),
+            "x1": np.asarray(x1s, dtype=float),
+            "y1": np.asarray(y1s, dtype=float),
+        },
+        "lines": {
+            "text": line_texts,
+            "y0": np.asarray(line_y0s, dtype=float),
+            "first_span": np.asarray(line_first, dtype=np.int64),
+        },
+    }
+
+def body_font_size(font_sizes, default=10.0):
+    """
+    Most common font size in the plausible body-text range (8, 24), with
+    ties going to the size seen first. Computed in a single vectorized
+    pass over the size column.
+    """
+    font_sizes = font_sizes[(font_sizes > 8) & (font_sizes < 24)]
+    if not font_sizes.size: return default
+    sizes, first_seen, counts = np.unique(font_sizes, return_index=True, return_counts=True)
+    return float(sizes[np.lexsort((first_seen, -counts))[0]])
+
+def extract_lines_cached(pdf_path, flags, cache_dir=CACHE_DIR):
+    """
+    Returns extract_lines() for a PDF, reusing a pickled result keyed by the
+    file's name, mtime and size and the extraction flags, so a PDF already
+    parsed with the same flags is never parsed again. Caching is
+    best-effort: an unwritable cache directory only disables reuse.
+    """
+    pdf_path = Path(pdf_path)
+    st = pdf_path.stat()
+    cache_file = Path(cache_dir) / (
+        f"{pdf_path.stem}-{st.st_mtime_ns}-{st.st_size}-f{flags}-v{_CACHE_VERSION}.pkl"
+    )
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    with fitz.open(pdf_path) as doc:
+        result = extract_lines(doc, flags)
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so concurrent workers never read a partial file
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+    return result
@@ -1,10 +1,22 @@
 # app.py
 import json
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import fitz  # PyMuPDF
-import statistics
-from collections import Counter
+import numpy as np
+
+from pdf_lines import body_font_size, extract_lines_cached
+
+# Heading numbering in one alternation: "1.2.3" -> level 3, "1.2" and
+# "Appendix" -> level 2, "1." -> level 1, keyed by the matched group name
+_RE_HEAD = re.compile(
+    r'^(?:(?P<n3>\d+\.\d+\.\d+)|(?P<n2>\d+\.\d+)|(?P<n1>\d+\.)|(?P<ap>Appendix))',
+    re.IGNORECASE
+)
+_HEAD_LEVELS = {"n3": 3, "n2": 2, "n1": 1, "ap": 2}
+_RE_WS = re.compile(r'\s+')
 
 class PDFOutlineExtractor:
     """
@@ -14,72 +26,89 @@ class PDFOutlineExtractor:
     """
 
     # --- 1. Preprocessing & Line Object Extraction ---
-    def _get_line_objects(self, doc):
-        """Extracts all lines with comprehensive metadata for analysis."""
-        lines = []
-        for page_num, page in enumerate(doc):
-            page_width, page_height = page.rect.width, page.rect.height
-            for b in page.get_text("dict")["blocks"]:
-                for l in b.get("lines", []):
-                    for s in l.get("spans", []):
-                        text = s["text"].strip()
-                        if not text: continue
-                        
-                        x_center = (s["bbox"][0] + s["bbox"][2]) / 2
-                        lines.append({
-                            "text": text,
-                            "font_size": round(s["size"], 2),
-                            "font_flags": s["flags"],
-                            "page_num": page_num,
-                            "bbox": s["bbox"],
-                            "y_rel": s["bbox"][1] / page_height,
-                            "is_centered": abs(x_center - page_width / 2) < 20,
-                            "is_all_caps": text.isupper() and len(text) > 1,
-                            "is_bold": (s["flags"] & 16) != 0,
-                        })
-        return lines
+    def _get_line_objects(self, layout):
+        """
+        Selects the non-empty spans of a shared pdf_lines layout and derives
+        the metadata used for analysis. Lines are stored column-wise: one
+        NumPy array per numeric field, indexed in parallel with "text".
+        Lines are in page order; "page_start" holds the offset of each page's
+        first line (plus a final end offset), so page p is
+        page_start[p]:page_start[p + 1].
+        """
+        spans = layout["spans"]
+        keep = np.flatnonzero([bool(t) for t in spans["text"]])
+        texts = [spans["text"][i] for i in keep]
+        page_nums = spans["page_num"][keep]
+        x0s, y0s, x1s = spans["x0"][keep], spans["y0"][keep], spans["x1"][keep]
+        flags = spans["flags"][keep]
+        return {
+            "text": texts,
+            "font_size": spans["size"][keep],
+            "font_flags": flags,
+            "page_num": page_nums,
+            "page_start": np.searchsorted(page_nums, np.arange(layout["page_count"] + 1)),
+            "x0": x0s,
+            "y0": y0s,
+            "x1": x1s,
+            "y1": spans["y1"][keep],
+            "y_rel": y0s / layout["page_height"][page_nums],
+            "is_centered": np.abs((x0s + x1s) / 2 - layout["page_width"][page_nums] / 2) < 20,
+            "text_len": np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)),
+            "ends_sentence": np.fromiter((t[-1] in '.?!' for t in texts), dtype=bool, count=len(texts)),
+            "is_all_caps": np.array([len(t) > 1 and t.isupper() for t in texts], dtype=bool),
+            "is_bold": (flags & 16) != 0,
+        }
+
+    def _line_at(self, lines, i):
+        """Materializes a single line of the column store as a dict."""
+        return {
+            "text": lines["text"][i],
+            "font_size": float(lines["font_size"][i]),
+            "page_num": int(lines["page_num"][i]),
+            "y0": float(lines["y0"][i]),
+            "is_centered": bool(lines["is_centered"][i]),
+            "is_all_caps": bool(lines["is_all_caps"][i]),
+            "is_bold": bool(lines["is_bold"][i]),
+        }
 
     # --- 2. Body Font-Size Estimation ---
     def _get_body_size(self, lines):
         """Determines the most common font size (body text)."""
-        if not lines: return 10.0
-        font_sizes = [l["font_size"] for l in lines if 8 < l["font_size"] < 24]
-        if not font_sizes: return 10.0
-        try:
-            return statistics.mode(font_sizes)
-        except statistics.StatisticsError:
-            return statistics.median(font_sizes)
+        return body_font_size(lines["font_size"])
 
     # --- 3. Title Candidate Selection ---
     def _extract_title(self, lines):
         """Implements stricter title extraction heuristics."""
-        candidates = [l for l in lines if l["page_num"] == 0 and l["y_rel"] < 0.30]
-        if not candidates: return ""
-
-        max_size = max(c["font_size"] for c in candidates)
-        title_lines = [c for c in candidates if c["font_size"] >= max_size - 0.5]
+        texts, sizes = lines["text"], lines["font_size"]
+        y0s, y1s = lines["y0"], lines["y1"]
+        # Only page 0 can hold the title; it is the leading slice of the store
+        page0_end = lines["page_start"][1]
+        candidates = np.flatnonzero(lines["y_rel"][:page0_end] < 0.30)
+        if not candidates.size: return ""
+
+        max_size = sizes[candidates].max()
+        title_lines = candidates[sizes[candidates] >= max_size - 0.5].tolist()
         
         # Filter by centered or left-aligned rules
         filtered_lines = [
-            l for l in title_lines
-            if l["is_centered"] or (len(l["text"].split()) >= 2)
+            i for i in title_lines
+            if lines["is_centered"][i] or (len(texts[i].split()) >= 2)
         ]
         if not filtered_lines: filtered_lines = title_lines
 
-        filtered_lines.sort(key=lambda l: l["bbox"][1])
+        filtered_lines.sort(key=lambda i: y0s[i])
 
         # Merge contiguous lines
         if not filtered_lines: return ""
-        title_text = filtered_lines[0]["text"]
-        last_y = filtered_lines[0]["bbox"][3]
-        for i in range(1, len(filtered_lines)):
-            line = filtered_lines[i]
-            if (line["bbox"][1] - last_y) < (1.5 * line["font_size"]):
-                title_text += " " + line["text"]
-                last_y = line["bbox"][3]
+        title_text = texts[filtered_lines[0]]
+        last_y = y1s[filtered_lines[0]]
+        for i in filtered_lines[1:]:
+            if (y0s[i] - last_y) < (1.5 * sizes[i]):
+                title_text += " " + texts[i]
+                last_y = y1s[i]
             else:
                 break
-        return re.sub(r'\s+', ' ', title_text).strip()
+        return _RE_WS.sub(' ', title_text).strip()
 
     def _process_headings(self, lines, title, body_size):
         """
@@ -87,15 +116,17 @@ class PDFOutlineExtractor:
         and hierarchy assignment.
         """
         # --- 4. Heading Candidate Filtering ---
+        # All per-line filters are fused into one boolean mask; only the
+        # title comparison runs per surviving candidate.
+        y_rel = lines["y_rel"]
+        size_ok = lines["font_size"] > (body_size + 1)
+        text_ok = (lines["text_len"] <= 60) & ~lines["ends_sentence"]
+        y_ok = ((y_rel >= 0.10) & (y_rel <= 0.90)) | lines["is_centered"]
+        title_lower = title.lower()
         candidates = []
-        for line in lines:
-            text = line["text"]
-            # Basic filters
-            if line["font_size"] <= (body_size + 1): continue
-            if len(text) > 60: continue
-            if text.endswith(('.', '?', '!')): continue
-            if (line["y_rel"] < 0.10 or line["y_rel"] > 0.90) and not line["is_centered"]: continue
-            if text.lower() == title.lower(): continue
+        for i in np.flatnonzero(size_ok & text_ok & y_ok):
+            if lines["text"][i].lower() == title_lower: continue
+            line = self._line_at(lines, i)
 
             # Special flyer rule
             if line["is_all_caps"] and line["is_centered"] and line["font_size"] > (body_size + 2):
@@ -112,10 +143,8 @@ class PDFOutlineExtractor:
             text = cand["text"]
 
             # Numbering regex
-            if re.match(r'^\d+\.\d+\.\d+', text): num_level = 3
-            elif re.match(r'^\d+\.\d+', text): num_level = 2
-            elif re.match(r'^\d+\.', text): num_level = 1
-            elif re.match(r'^Appendix', text, re.IGNORECASE): num_level = 2
+            m = _RE_HEAD.match(text)
+            if m: num_level = _HEAD_LEVELS[m.lastgroup]
 
             if num_level > 0: score += 5
             if text.endswith(':'): score += 1
@@ -145,7 +174,8 @@ class PDFOutlineExtractor:
                 "level": f"H{final_level_int}",
                 "text": cand["text"],
                 "page": cand["page_num"], # Keep 0-indexed for now
-                "y0": cand["bbox"][1]
+                "y0": cand["y0"],
+                "text_hash": hash(cand["text"])
             })
 
         # --- 7. Outline Construction (Sort by document order) ---
@@ -166,30 +196,33 @@ class PDFOutlineExtractor:
         for i in range(1, len(clean_outline)):
             prev = final_outline[-1]
             curr = clean_outline[i]
-            if not (curr["text"] == prev["text"] and curr["page"] <= prev["page"] + 1):
+            # Cheap integer compare first; strings only compared on a hash hit
+            is_dup = curr["text_hash"] == prev["text_hash"] and curr["text"] == prev["text"]
+            if not (is_dup and curr["page"] <= prev["page"] + 1):
                 final_outline.append(curr)
         
-        # Remove temporary 'y0' key
+        # Remove temporary 'y0' and 'text_hash' keys
         for h in final_outline:
             del h['y0']
+            del h['text_hash']
 
         return final_outline
 
     def process_pdf(self, pdf_path):
         """Main processing pipeline for a single PDF."""
-        doc = fitz.open(pdf_path)
-        if doc.page_count == 0:
+        # Text-only flags: default dict extraction (media-box clipping, MuPDF
+        # inserted spaces) without decoding image blocks, which are never used
+        layout = extract_lines_cached(pdf_path, fitz.TEXTFLAGS_TEXT)
+        if layout["page_count"] == 0:
             return {"title": "", "outline": []}
 
-        lines = self._get_line_objects(doc)
+        lines = self._get_line_objects(layout)
         body_size = self._get_body_size(lines)
         title = self._extract_title(lines)
         
         outline = self._process_headings(lines, title, body_size)
         final_outline = self._post_process(title, outline)
         
-        doc.close()
-        
         # --- 10. Output Formatting ---
         return {"title": title, "outline": final_outline}
 
@@ -202,13 +235,15 @@ def main():
     pdf_files = list(input_dir.glob("*.pdf"))
     if not pdf_files: return
 
+    # PDFs are independent and fitz objects are not thread-safe, so fan the
+    # work out over processes; the extractor is stateless and pickles cleanly.
     extractor = PDFOutlineExtractor()
-    for pdf_file in pdf_files:
-        result = extractor.process_pdf(pdf_file)
-        
-        output_file = output_dir / f"{pdf_file.stem}.json"
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(result, f, indent=4, ensure_ascii=False)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        results = ex.map(extractor.process_pdf, pdf_files, chunksize=1)
+        for pdf_file, result in zip(pdf_files, results):
+            output_file = output_dir / f"{pdf_file.stem}.json"
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=4, ensure_ascii=False)
 
 if __name__ == "__main__":
     main()
@@ -1,15 +1,21 @@
 # download_model.py
-from sentence_transformers import SentenceTransformer
-import nltk
+from optimum.onnxruntime import ORTModelForFeatureExtraction
+from onnxruntime.quantization import quantize_dynamic, QuantType
+from transformers import AutoTokenizer
+
+from embedder import MODEL_NAME, ONNX_MODEL_DIR, ONNX_MODEL_FILE
 
-# Define the model name from the architecture blueprint
-MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
 print(f"Downloading model: {MODEL_NAME}")
 
-# Download and cache the sentence transformer model
-SentenceTransformer(MODEL_NAME)
-print("Model downloaded successfully.")
+# Export the sentence transformer to ONNX alongside its tokenizer
+ORTModelForFeatureExtraction.from_pretrained(MODEL_NAME, export=True).save_pretrained(ONNX_MODEL_DIR)
+AutoTokenizer.from_pretrained(MODEL_NAME).save_pretrained(ONNX_MODEL_DIR)
+print("Model exported to ONNX successfully.")
 
-# Download the 'punkt' tokenizer for sentence splitting
-nltk.download('punkt')
-print("NLTK 'punkt' downloaded successfully.")
+# Quantize weights to int8 so CPU inference runs on int8 dot-product kernels
+quantize_dynamic(
+    ONNX_MODEL_DIR / "model.onnx",
+    ONNX_MODEL_DIR / ONNX_MODEL_FILE,
+    weight_type=QuantType.QInt8
+)
+print("Model quantized to int8 successfully.")
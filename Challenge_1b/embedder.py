@@ -0,0 +1,58 @@
+# embedder.py
+from pathlib import Path
+import torch
+import torch.nn.functional as F
+from optimum.onnxruntime import ORTModelForFeatureExtraction
+from transformers import AutoTokenizer
+
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+ONNX_MODEL_DIR = Path(__file__).resolve().parent / "onnx_model"
+ONNX_MODEL_FILE = "model_int8.onnx"
+MAX_SEQ_LENGTH = 256  # Same limit sentence-transformers uses for this model
+
+class SentenceEncoder:
+    """
+    Runs the int8-quantized ONNX export of the MiniLM bi-encoder on CPU and
+    reproduces the mean pooling of the original sentence-transformers model.
+    """
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, file_name=ONNX_MODEL_FILE):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_dir, file_name=file_name, provider="CPUExecutionProvider"
+        )
+
+    def _mean_pool(self, token_embeddings, attention_mask):
+        """Averages token embeddings, ignoring padding positions."""
+        mask = attention_mask.unsqueeze(-1).to(token_embeddings.dtype)
+        return (token_embeddings * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+
+    def encode(self, texts, batch_size=64, normalize_embeddings=True):
+        """
+        Embeds a string or a sequence of strings (anything supporting len()
+        and indexing). Returns a 1-D tensor for a single string and a
+        (len(texts), dim) tensor otherwise.
+        """
+        single = isinstance(texts, str)
+        if single: texts = [texts]
+
+        # Batch texts of similar length together to minimize padding, then
+        # restore the caller's order at the end.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batches = []
+        for start in range(0, len(order), batch_size):
+            batch = self.tokenizer(
+                [texts[i] for i in order[start:start + batch_size]], padding=True,
+                truncation=True, max_length=MAX_SEQ_LENGTH, return_tensors="pt"
+            )
+            with torch.inference_mode():
+                token_embeddings = self.model(**batch).last_hidden_state
+            batches.append(self._mean_pool(token_embeddings, batch["attention_mask"]))
+
+        if not batches:
+            return torch.empty(0, self.model.config.hidden_size)
+        embeddings = torch.empty(len(texts), batches[0].shape[1])
+        embeddings[torch.tensor(order)] = torch.cat(batches)
+        if normalize_embeddings:
+            embeddings = F.normalize(embeddings, dim=1)
+        return embeddings[0] if single else embeddings
@@ -1,8 +1,18 @@
 # pdf_parser.py
 import re
+import sys
+from bisect import bisect_right
 from pathlib import Path
 import fitz  # PyMuPDF
-import statistics
+import numpy as np
+
+try:
+    from pdf_lines import body_font_size, extract_lines_cached
+except ModuleNotFoundError:
+    # Running from a source checkout: the shared module lives in Challenge_1a
+    # (the Docker image copies it next to this file).
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Challenge_1a"))
+    from pdf_lines import body_font_size, extract_lines_cached
 
 class PDFParser:
     """
@@ -10,88 +20,76 @@ class PDFParser:
     structured content chunks based on a document's hierarchical outline.
     """
 
-    def _get_line_objects(self, doc):
-        """Extracts all lines of text with their properties."""
-        lines = []
-        for page_num, page in enumerate(doc):
-            blocks = page.get_text("dict", flags=fitz.TEXT_INHIBIT_SPACES)["blocks"]
-            for b in blocks:
-                if "lines" in b:
-                    for l in b["lines"]:
-                        if not l["spans"]: continue
-                        text = " ".join(s["text"] for s in l["spans"]).strip()
-                        if not text: continue
-                        span = l["spans"][0]
-                        lines.append({
-                            "text": text,
-                            "size": round(span["size"], 2),
-                            "bold": (span["flags"] & 16) != 0,
-                            "page_num": page_num,
-                            "y0": l["bbox"][1]
-                        })
-        return lines
+    def _get_line_objects(self, layout):
+        """
+        Extracts all lines of text with their properties from a shared
+        pdf_lines layout, stored column-wise: one NumPy array per numeric
+        field, parallel to the "text" list. Size and boldness come from the
+        first span of each line.
+        """
+        spans, lines = layout["spans"], layout["lines"]
+        first = lines["first_span"]
+        return {
+            "text": lines["text"],
+            "size": spans["size"][first],
+            "bold": (spans["flags"][first] & 16) != 0,
+            "page_num": spans["page_num"][first],
+            "y0": lines["y0"],
+        }
 
     def _get_body_text_size(self, lines):
         """Determines the most common font size (body text)."""
-        if not lines: return 10.0
-        font_sizes = [l["size"] for l in lines if 8 < l["size"] < 24]
-        if not font_sizes: return 10.0
-        try:
-            return statistics.mode(font_sizes)
-        except statistics.StatisticsError:
-            return statistics.median(font_sizes)
+        return body_font_size(lines["size"])
 
     def _get_headings(self, lines, body_size):
         """Identifies headings based on font size and boldness."""
-        headings = []
-        for line in lines:
-            if line["size"] > body_size + 1 and len(line["text"].split()) < 20:
-                headings.append(line)
-        headings.sort(key=lambda x: (x["page_num"], x["y0"]))
-        return headings
+        idx = np.flatnonzero(lines["size"] > body_size + 1)
+        idx = [i for i in idx if len(lines["text"][i].split()) < 20]
+        # Stable sort by (page, y0), as lexsort keys are given last-primary
+        idx = np.asarray(idx, dtype=np.int64)
+        idx = idx[np.lexsort((lines["y0"][idx], lines["page_num"][idx]))]
+        return [
+            {"text": lines["text"][i], "page_num": int(lines["page_num"][i]), "y0": float(lines["y0"][i])}
+            for i in idx
+        ]
 
     def process_pdf(self, pdf_path):
         """
         Processes a single PDF and returns a list of structured content chunks.
         Each chunk represents the text content under a specific heading.
         """
-        doc = fitz.open(pdf_path)
-        if doc.page_count == 0:
+        layout = extract_lines_cached(pdf_path, fitz.TEXT_INHIBIT_SPACES)
+        if layout["page_count"] == 0:
             return []
 
-        lines = self._get_line_objects(doc)
+        lines = self._get_line_objects(layout)
         body_size = self._get_body_text_size(lines)
         headings = self._get_headings(lines, body_size)
 
         chunks = []
         if not headings:
             # If no headings, treat the whole document as one chunk
-            full_text = " ".join([line["text"] for line in lines])
+            full_text = " ".join(lines["text"])
             chunks.append({
                 "doc_name": Path(pdf_path).name,
                 "page": 0,
-                "section_title": doc.metadata.get("title") or Path(pdf_path).stem,
+                "section_title": layout["metadata_title"] or Path(pdf_path).stem,
                 "content": full_text
             })
-            doc.close()
             return chunks
 
-        # Create chunks by associating text with the preceding heading
-        for i, heading in enumerate(headings):
-            start_page = heading["page_num"]
-            start_y = heading["y0"]
-            
-            end_page = headings[i+1]["page_num"] if i + 1 < len(headings) else doc.page_count
-            end_y = headings[i+1]["y0"] if i + 1 < len(headings) else float('inf')
-
-            content = []
-            for line in lines:
-                is_after_start = (line["page_num"] > start_page) or (line["page_num"] == start_page and line["y0"] > start_y)
-                is_before_end = (line["page_num"] < end_page) or (line["page_num"] == end_page and line["y0"] < end_y)
-                
-                if is_after_start and is_before_end:
-                    content.append(line["text"])
+        # Create chunks by associating text with the preceding heading.
+        # Headings are sorted by (page, y0), so each line's owning heading is
+        # found by bisecting the heading positions instead of rescanning every
+        # line once per heading. Lines keep their extraction order.
+        bounds = [(h["page_num"], h["y0"]) for h in headings]
+        chunk_texts = [[] for _ in headings]
+        for text, pos in zip(lines["text"], zip(lines["page_num"].tolist(), lines["y0"].tolist())):
+            hi = bisect_right(bounds, pos) - 1
+            if hi >= 0 and pos > bounds[hi]:
+                chunk_texts[hi].append(text)
 
+        for heading, content in zip(headings, chunk_texts):
             chunks.append({
                 "doc_name": Path(pdf_path).name,
                 "page": heading["page_num"],
@@ -99,5 +97,4 @@ class PDFParser:
                 "content": " ".join(content)
             })
             
-        doc.close()
         return chunks
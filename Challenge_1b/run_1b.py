@@ -1,24 +1,48 @@
 # run_1b.py
 import json
+import os
+import re
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-import torch
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-import nltk
 
+from embedder import SentenceEncoder
 from pdf_parser import PDFParser
 
 # --- 1. System Overview ---
 
 # Constants
-MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
 INPUT_DIR = Path("/app/input")
 OUTPUT_DIR = Path("/app/output")
 TOP_K_RETRIEVAL = 20  # Retrieve top 20 chunks
 TOP_N_SENTENCES = 15 # Re-rank and keep top 15 sentences
+# Sentence boundary: terminal punctuation followed by whitespace and a capital or digit
+_SENT_SPLIT = re.compile(r'(?<=[\.!\?])\s+(?=[A-Z0-9])')
+
+class _EncoderInputs:
+    """
+    The retrieval query followed by every chunk's content, exposed as a
+    read-only sequence so the texts are never copied into a separate list.
+    """
+
+    def __init__(self, query, chunks):
+        self.query = query
+        self.chunks = chunks
+
+    def __len__(self):
+        return len(self.chunks) + 1
+
+    def __getitem__(self, i):
+        return self.query if i == 0 else self.chunks[i - 1]["content"]
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first, without a full sort."""
+    k = min(k, len(scores))
+    if k == 0: return np.array([], dtype=np.int64)
+    part = np.argpartition(scores, -k)[-k:]
+    return part[np.argsort(-scores[part], kind="stable")]
 
 def main():
     # Load persona and JBTD from the new input.json format
@@ -39,42 +63,48 @@ def main():
     parser = PDFParser()
     all_chunks = []
     print("Step 1: Parsing and Chunking PDFs...")
+    existing_files = []
     for pdf_file in pdf_files:
         if pdf_file.exists():
-            all_chunks.extend(parser.process_pdf(pdf_file))
+            existing_files.append(pdf_file)
         else:
             print(f"Warning: Document {pdf_file.name} not found in input directory.")
 
+    # Documents are parsed in parallel; PyMuPDF is not thread-safe, so use
+    # processes. map() keeps chunks in input document order.
+    if existing_files:
+        with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(existing_files))) as ex:
+            for chunks in ex.map(parser.process_pdf, existing_files):
+                all_chunks.extend(chunks)
+
     if not all_chunks:
         print("No content chunks were extracted. Exiting.")
         return
 
+    # Document order of each chunk, used to order sentences within a passage
+    chunk_order = {id(c): i for i, c in enumerate(all_chunks)}
+
     # --- Vector Store Construction ---
     print("Step 2: Building Vector Store...")
-    # Use GPU if available, otherwise CPU. This will run on CPU in the hackathon env.
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    embedding_model = SentenceTransformer(MODEL_NAME, device=device)
+    # int8 ONNX Runtime encoder; the hackathon environment is CPU-only.
+    embedding_model = SentenceEncoder()
     
-    chunk_contents = [chunk["content"] for chunk in all_chunks]
-    chunk_embeddings = embedding_model.encode(chunk_contents, convert_to_tensor=True, show_progress_bar=True)
+    # The query is embedded in the same batched pass as the chunks
+    retrieval_query = f"Role: {persona}. Task: {job_to_be_done}"
+    embeddings = embedding_model.encode(_EncoderInputs(retrieval_query, all_chunks))
+    query_embedding, chunk_embeddings = embeddings[0], embeddings[1:]
 
     # --- Persona-Augmented Retrieval ---
     print("Step 3: Performing Persona-Augmented Retrieval...")
-    retrieval_query = f"Role: {persona}. Task: {job_to_be_done}"
-    query_embedding = embedding_model.encode(retrieval_query, convert_to_tensor=True)
 
-    # Calculate cosine similarity
-    similarities = cosine_similarity(
-        query_embedding.cpu().numpy().reshape(1, -1),
-        chunk_embeddings.cpu().numpy()
-    )[0]
+    # Embeddings are unit-normalized, so cosine similarity is a dot product
+    similarities = (chunk_embeddings @ query_embedding).numpy()
 
     # Get top K chunks
-    top_k_indices = np.argsort(similarities)[-TOP_K_RETRIEVAL:][::-1]
+    top_k_indices = _top_k(similarities, TOP_K_RETRIEVAL)
     retrieved_chunks = [all_chunks[i] for i in top_k_indices]
-    retrieved_scores = {i: similarities[i] for i in top_k_indices}
-    for chunk_idx, chunk in enumerate(retrieved_chunks):
-        chunk['retrieval_score'] = retrieved_scores[top_k_indices[chunk_idx]]
+    for idx, chunk in zip(top_k_indices, retrieved_chunks):
+        chunk['retrieval_score'] = float(similarities[idx])
 
 
     # --- Sentence-Level Refinement ---
@@ -82,7 +112,7 @@ def main():
     sentences = []
     for chunk in retrieved_chunks:
         # Split chunk into sentences
-        sents = nltk.sent_tokenize(chunk["content"])
+        sents = [s for s in _SENT_SPLIT.split(chunk["content"].strip()) if s]
         for sent in sents:
             sentences.append({
                 "text": sent,
@@ -91,18 +121,14 @@ def main():
 
     sentence_texts = [s["text"] for s in sentences]
     # Re-rank using the same bi-encoder for efficiency
-    sentence_embeddings = embedding_model.encode(sentence_texts, convert_to_tensor=True)
-    sentence_similarities = cosine_similarity(
-        query_embedding.cpu().numpy().reshape(1, -1),
-        sentence_embeddings.cpu().numpy()
-    )[0]
+    sentence_embeddings = embedding_model.encode(sentence_texts)
+    sentence_similarities = (sentence_embeddings @ query_embedding).numpy()
     
     for i, sent in enumerate(sentences):
         sent["rerank_score"] = sentence_similarities[i]
         
     # Keep top N sentences
-    sentences.sort(key=lambda x: x["rerank_score"], reverse=True)
-    top_sentences = sentences[:TOP_N_SENTENCES]
+    top_sentences = [sentences[i] for i in _top_k(sentence_similarities, TOP_N_SENTENCES)]
 
     # --- Reconstruction & Final Importance Ranking ---
     print("Step 5: Reconstructing Passages and Ranking...")
@@ -123,7 +149,7 @@ def main():
     ranked_passages = []
     for passage_id, passage_data in passages.items():
         # Sort sentences by their original order within the document
-        passage_data["sentences"].sort(key=lambda s: chunk_contents.index(s['source_chunk']['content']))
+        passage_data["sentences"].sort(key=lambda s: chunk_order[id(s['source_chunk'])])
         
         # Calculate final passage score
         avg_rerank_score = np.mean([s["rerank_score"] for s in passage_data["sentences"]])